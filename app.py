@@ -8,6 +8,7 @@ Description: Automatically captures screenshots of all slides from multiple HTML
 Installation:
     pip install playwright
     playwright install chromium
+    pip install pillow          # optional, chỉ cần cho --full-page-crop
 
 Usage:
     # Interactive mode
@@ -16,14 +17,112 @@ Usage:
     # With arguments
     python capture_all.py --input "./slides" --output "./images"
     python capture_all.py -i "./slides" -o "./images" -c ".slide"
+
+    # Daemon mode: giữ Chromium chạy sẵn, các lần chạy với --use-daemon gửi batch qua socket
+    python capture_all.py --daemon
+    python capture_all.py -i "./slides" -o "./images" --use-daemon
 """
 
 import os
 import argparse
+import re
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import shutil
+import socket
+import subprocess
+import sys
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from playwright.sync_api import sync_playwright, Page
+from typing import TYPE_CHECKING, Optional
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 import time
-from collections import Counter
+
+from browser_pool import get_browser, close_browser
+
+if TYPE_CHECKING:
+    # Page chỉ dùng cho type hint
+    from playwright.async_api import Page
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow là optional, chỉ cần cho --full-page-crop
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+# Số page render đồng thời trong cùng một browser
+DEFAULT_CONCURRENCY = 4
+
+# Ảnh chụp ở độ phân giải gấp đôi (retina)
+DEVICE_SCALE_FACTOR = 2
+
+# Chiều cao tối đa (pixel thật) của một screenshot toàn trang; cao hơn Chromium
+# sẽ cắt/lặp tile, nên --full-page-crop quay về capture từng slide
+MAX_FULL_PAGE_HEIGHT = 16384
+
+# Định dạng ảnh output -> phần mở rộng file
+IMAGE_EXTENSIONS = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+DEFAULT_IMAGE_FORMAT = "jpeg"
+DEFAULT_QUALITY = 90
+
+# Viewport cố định cho mọi page (giống default của Playwright để layout không đổi)
+DEFAULT_VIEWPORT = (1280, 720)
+
+# Số thread ghi ảnh xuống đĩa chạy nền
+IO_WORKERS = 4
+
+# oxipng: tối ưu PNG lossless sau khi capture (chạy nền, mỗi process 1 thread)
+OXIPNG_ARGS = ["-o", "2", "--strip", "safe", "--threads", "1", "--quiet"]
+
+# Manifest cho incremental mode: ghi lại file HTML nào đã tạo ra slide nào
+MANIFEST_NAME = ".manifest.json"
+# Tăng version khi cách render thay đổi (vd: flag Chromium) để manifest cũ bị bỏ qua
+MANIFEST_VERSION = 2
+
+# Số byte đầu file dùng để nhận diện các deck cùng template
+FINGERPRINT_BYTES = 4096
+
+# Số byte đầu file được quét tìm dấu hiệu framework (đủ cho <head> có CSS inline lớn)
+FRAMEWORK_SCAN_BYTES = 256 * 1024
+
+
+def _class_token_pattern(tag: str, token: str) -> str:
+    """Regex cho thẻ mở `tag` có `token` là một class riêng (không khớp 'reveal-modal')"""
+    return rf"""<{tag}\b[^>]*\bclass=["'](?:[^"']*\s)?{token}(?:\s[^"']*)?["'][^>]*>"""
+
+
+# Dấu hiệu (markup gốc) của các framework slide phổ biến -> selector slide tương ứng.
+# Khớp thì thử selector này trước bước auto-detect bằng JavaScript.
+FRAMEWORK_SIGNATURES = [
+    ("Marp", re.compile(r"<svg\b[^>]*\bdata-marpit-svg\b"), "svg[data-marpit-svg]"),
+    ("Slidev", re.compile(_class_token_pattern("div", "slidev-page")), ".slidev-page"),
+    (
+        "reveal.js",
+        re.compile(_class_token_pattern("div", "reveal") + r"\s*" + _class_token_pattern("div", "slides")),
+        ".reveal .slides > section",
+    ),
+    ("impress.js", re.compile(r"""<div\b[^>]*\bid=["']impress["']"""), "#impress .step"),
+]
+
+# Thời gian tối đa chờ slide selector xuất hiện (ms)
+SELECTOR_WAIT_TIMEOUT = 5000
+
+# Daemon chỉ lắng nghe trên localhost
+DAEMON_HOST = "127.0.0.1"
+DEFAULT_DAEMON_PORT = 8765
+
+# Dòng chào daemon gửi ngay khi có kết nối, để client không gửi batch nhầm cho service khác
+DAEMON_PROTOCOL = "html-slide-capture/1"
+# Thời gian tối đa chờ dòng chào (giây)
+DAEMON_HANDSHAKE_TIMEOUT = 2
 
 
 def get_user_input_paths():
@@ -98,6 +197,48 @@ def get_user_input_class():
     return user_class
 
 
+def parse_viewport(value: str) -> tuple[int, int]:
+    """
+    Parse kích thước viewport dạng WIDTHxHEIGHT (vd: 1920x1080)
+    
+    Returns:
+        tuple: (width, height)
+    
+    Raises:
+        argparse.ArgumentTypeError: Nếu giá trị không hợp lệ
+    """
+    try:
+        width, height = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Viewport không hợp lệ: {value} (vd: 1920x1080)")
+    
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"Viewport không hợp lệ: {value} (vd: 1920x1080)")
+    
+    return width, height
+
+
+def parse_quality(value: str) -> int:
+    """
+    Parse chất lượng nén ảnh (1-100)
+    
+    Returns:
+        int: Quality
+    
+    Raises:
+        argparse.ArgumentTypeError: Nếu giá trị không hợp lệ
+    """
+    try:
+        quality = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Quality không hợp lệ: {value} (1-100)")
+    
+    if not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError(f"Quality không hợp lệ: {value} (1-100)")
+    
+    return quality
+
+
 def parse_arguments():
     """
     Parse command line arguments
@@ -119,6 +260,10 @@ Examples:
   
   # Specify class selector
   python capture_all.py -i "./slides" -o "./images" --class ".my-slide"
+  
+  # Keep Chromium warm between runs
+  python capture_all.py --daemon
+  python capture_all.py -i "./slides" -o "./images" --use-daemon
         """
     )
     
@@ -144,12 +289,113 @@ Examples:
         help="CSS selector cho slide (vd: .slide, section). Nếu không chỉ định sẽ auto-detect"
     )
     
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        dest="concurrency",
+        help=f"Số file HTML render song song trong cùng browser (default: {DEFAULT_CONCURRENCY})"
+    )
+    
+    parser.add_argument(
+        "--browsers",
+        type=int,
+        default=1,
+        dest="browser_count",
+        help="Số Chromium process chia nhau các worker, dùng khi nhiều worker làm nghẽn một browser (default: 1)"
+    )
+    
+    parser.add_argument(
+        "--format",
+        choices=sorted(IMAGE_EXTENSIONS),
+        default=DEFAULT_IMAGE_FORMAT,
+        dest="image_format",
+        help=f"Định dạng ảnh output (default: {DEFAULT_IMAGE_FORMAT}). PNG chậm hơn và nặng hơn nhiều"
+    )
+    
+    parser.add_argument(
+        "--quality",
+        type=parse_quality,
+        default=DEFAULT_QUALITY,
+        help=f"Chất lượng nén 1-100 cho jpeg/webp (default: {DEFAULT_QUALITY}, bỏ qua với png)"
+    )
+    
+    parser.add_argument(
+        "--viewport",
+        type=parse_viewport,
+        default=DEFAULT_VIEWPORT,
+        help="Kích thước viewport dạng WIDTHxHEIGHT, nên khớp kích thước slide (default: 1280x720)"
+    )
+    
+    parser.add_argument(
+        "--no-optimize",
+        action="store_false",
+        dest="optimize_png",
+        help="Không chạy oxipng để nén lại ảnh PNG sau khi capture"
+    )
+    
+    parser.add_argument(
+        "--full-page-crop",
+        action="store_true",
+        help="Chụp một ảnh toàn trang rồi cắt từng slide bằng Pillow (nhanh với deck nhiều slide nhỏ); "
+             "không cuộn tới từng slide nên hiệu ứng reveal theo IntersectionObserver có thể không chạy"
+    )
+    
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help="Chỉ capture một lần cho các file HTML có nội dung giống hệt nhau, copy ảnh cho các bản trùng"
+    )
+    
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Capture lại tất cả file, kể cả file HTML không thay đổi từ lần chạy trước"
+    )
+    
+    parser.add_argument(
+        "--block-network",
+        action="store_true",
+        help="Chặn mọi request không phải file:// (font, CDN, analytics...) để load nhanh và ổn định hơn"
+    )
+    
     parser.add_argument(
         "--no-interactive",
         action="store_true",
         help="Không hỏi user, dùng default values"
     )
     
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        help="Chỉ in cảnh báo và lỗi"
+    )
+    verbosity.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="In thêm log chi tiết cho từng slide"
+    )
+    
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Chạy nền, giữ Chromium sống và nhận batch request qua socket"
+    )
+    
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_DAEMON_PORT,
+        help=f"Port của daemon (default: {DEFAULT_DAEMON_PORT})"
+    )
+    
+    parser.add_argument(
+        "--use-daemon",
+        action="store_true",
+        help="Gửi batch tới daemon đang chạy (nếu có); log của batch theo -q/-v của daemon"
+    )
+    
     return parser.parse_args()
 
 
@@ -178,23 +424,131 @@ def validate_directory(path: str, dir_type: str = "input") -> Path:
     return path_obj
 
 
-def detect_slide_class(page: Page) -> tuple[str, int]:
+async def count_selectors(page: "Page", selectors: list[str]) -> dict[str, int]:
+    """
+    Đếm số element của nhiều selector trong một lần page.evaluate
+
+    Args:
+        page: Playwright page instance
+        selectors: Danh sách CSS selector cần đếm
+
+    Returns:
+        dict: {selector: số element}, selector không hợp lệ được tính là 0
+    """
+    return await page.evaluate("""
+        (selectors) => Object.fromEntries(selectors.map(sel => {
+            try {
+                return [sel, document.querySelectorAll(sel).length];
+            } catch (e) {
+                return [sel, 0];
+            }
+        }))
+    """, selectors)
+
+
+# Selector dự phòng khi phân tích class không ra kết quả (cần >= 2 element)
+ALTERNATIVE_SELECTORS = [
+    '[class*="slide"]', 
+    '[class*="container"]',
+    '[class*="page"]',
+    'section',
+    '[class*="screen"]',
+    'body > div'
+]
+
+# Selector phổ biến thử cuối cùng (chỉ cần >= 1 element)
+COMMON_SELECTORS = [
+    '.slide',
+    '.slides',
+    'section',
+    '.page',
+    '.screen',
+    '[class*="slide"]',
+    'body > div > div'
+]
+
+
+# Số body > div tối đa được phân tích khi auto-detect (giới hạn cho page bất thường)
+MAX_DETECT_DIVS = 500
+
+# Hàm phân tích class được inject một lần vào mọi page qua context.add_init_script;
+# mỗi lần detect chỉ cần gọi window.__detectSlideClass(config), không gửi lại source
+DETECT_SLIDE_CLASS_JS = """
+window.__detectSlideClass = (config) => {
+    const { blacklistKeywords, priorityKeywords, candidateSelectors, maxDivs } = config;
+
+    // Đếm luôn các selector dự phòng trong cùng round-trip
+    const selectorCounts = {};
+    candidateSelectors.forEach(sel => {
+        try {
+            selectorCounts[sel] = document.querySelectorAll(sel).length;
+        } catch (e) {
+            selectorCounts[sel] = 0;
+        }
+    });
+
+    // Chỉ lấy body > div trực tiếp (level 1)
+    const directChildren = document.querySelectorAll('body > div');
+    const classMap = {};
+    const classInfo = {};
+
+    // Chỉ xét tối đa maxDivs phần tử để page bất thường không làm detect chậm
+    const limit = Math.min(directChildren.length, maxDivs);
+    for (let i = 0; i < limit; i++) {
+        const div = directChildren[i];
+        if (div.classList.length === 0) continue;
+
+        const firstClass = div.classList[0];
+        // Keyword đã được lowercase sẵn từ Python, chỉ lowercase class một lần
+        const lowerClass = firstClass.toLowerCase();
+
+        // Bỏ qua nếu class chứa blacklist keyword
+        const isBlacklisted = blacklistKeywords.some(keyword => lowerClass.includes(keyword));
+
+        if (isBlacklisted) continue;
+
+        // Đếm số lượng
+        classMap[firstClass] = (classMap[firstClass] || 0) + 1;
+
+        // Lưu thông tin về kích thước (chỉ lưu 1 lần)
+        if (!classInfo[firstClass]) {
+            const rect = div.getBoundingClientRect();
+            const hasPriority = priorityKeywords.some(keyword => lowerClass.includes(keyword));
+            classInfo[firstClass] = {
+                width: rect.width,
+                height: rect.height,
+                hasPriority: hasPriority
+            };
+        }
+    }
+
+    return { classMap, classInfo, selectorCounts };
+};
+"""
+
+
+async def detect_slide_class(page: "Page") -> tuple[str, int, dict[str, int]]:
     """
     Auto-detect slide class name bằng cách phân tích cấu trúc HTML
     
     Strategy:
-    1. Ưu tiên body > div trực tiếp (slide thường là con trực tiếp của body)
+    1. Ưu tiên body > div trực tiếp (slide thường là con trực tiếp của body),
+       tối đa MAX_DETECT_DIVS phần tử
     2. Loại bỏ các class trong blacklist (watermark, overlay, modal, etc.)
     3. Ưu tiên class có chứa keyword như "slide", "container", "page"
     4. Check kích thước element (slide thường có width/height lớn)
     
+    Số element của ALTERNATIVE_SELECTORS và COMMON_SELECTORS được đếm luôn
+    trong cùng lần evaluate, để các fallback không cần thêm round-trip nào.
+    
     Args:
         page: Playwright page instance
     
     Returns:
-        tuple: (class_name, element_count) hoặc (None, 0) nếu không tìm được
+        tuple: (class_name, element_count, selector_counts) hoặc (None, 0, selector_counts)
+               nếu không tìm được; selector_counts rỗng nếu evaluate lỗi
     """
-    print("\n🔍 Auto-detecting slide class name...")
+    logger.info("\n🔍 Auto-detecting slide class name...")
     
     # Blacklist các class thường dùng cho overlay/watermark/decorative elements
     BLACKLIST_KEYWORDS = [
@@ -212,61 +566,33 @@ def detect_slide_class(page: Page) -> tuple[str, int]:
     
     try:
         # Phân tích sâu hơn với JavaScript
-        class_analysis = page.evaluate("""
-            (config) => {
-                const { blacklistKeywords, priorityKeywords } = config;
-                
-                // Chỉ lấy body > div trực tiếp (level 1)
-                const directChildren = document.querySelectorAll('body > div');
-                const classMap = {};
-                const classInfo = {};
-                
-                directChildren.forEach(div => {
-                    if (div.classList.length > 0) {
-                        const firstClass = div.classList[0];
-                        
-                        // Bỏ qua nếu class chứa blacklist keyword
-                        const isBlacklisted = blacklistKeywords.some(keyword => 
-                            firstClass.toLowerCase().includes(keyword.toLowerCase())
-                        );
-                        
-                        if (isBlacklisted) return;
-                        
-                        // Đếm số lượng
-                        classMap[firstClass] = (classMap[firstClass] || 0) + 1;
-                        
-                        // Lưu thông tin về kích thước (chỉ lưu 1 lần)
-                        if (!classInfo[firstClass]) {
-                            const rect = div.getBoundingClientRect();
-                            const hasPriority = priorityKeywords.some(keyword =>
-                                firstClass.toLowerCase().includes(keyword.toLowerCase())
-                            );
-                            classInfo[firstClass] = {
-                                width: rect.width,
-                                height: rect.height,
-                                hasPriority: hasPriority
-                            };
-                        }
-                    }
-                });
-                
-                return { classMap, classInfo };
-            }
-        """, {"blacklistKeywords": BLACKLIST_KEYWORDS, "priorityKeywords": PRIORITY_KEYWORDS})
+        detect_config = {
+            "blacklistKeywords": [keyword.lower() for keyword in BLACKLIST_KEYWORDS],
+            "priorityKeywords": [keyword.lower() for keyword in PRIORITY_KEYWORDS],
+            "candidateSelectors": ALTERNATIVE_SELECTORS + COMMON_SELECTORS,
+            "maxDivs": MAX_DETECT_DIVS
+        }
+        call_detector = "(config) => window.__detectSlideClass ? window.__detectSlideClass(config) : null"
+        class_analysis = await page.evaluate(call_detector, detect_config)
+        if class_analysis is None:
+            # Page không được tạo từ context của batch: inject detector rồi gọi lại
+            await page.add_script_tag(content=DETECT_SLIDE_CLASS_JS)
+            class_analysis = await page.evaluate(call_detector, detect_config)
         
         class_map = class_analysis.get('classMap', {})
         class_info = class_analysis.get('classInfo', {})
+        counts = class_analysis.get('selectorCounts', {})
         
         if not class_map:
-            print("   ⚠️  No valid div with classes found (after filtering)")
-            return None, 0
+            logger.warning("   ⚠️  No valid div with classes found (after filtering)")
+            return None, 0, counts
         
-        print(f"   📊 Class distribution (filtered):")
+        logger.info(f"   📊 Class distribution (filtered):")
         for cls, count in sorted(class_map.items(), key=lambda x: x[1], reverse=True):
             info = class_info.get(cls, {})
             priority_mark = "⭐" if info.get('hasPriority') else ""
             size_info = f"({info.get('width', 0):.0f}x{info.get('height', 0):.0f})" if info else ""
-            print(f"      .{cls}: {count} elements {size_info} {priority_mark}")
+            logger.info(f"      .{cls}: {count} elements {size_info} {priority_mark}")
         
         # Scoring system để chọn class tốt nhất
         def calculate_score(class_name, count, info):
@@ -301,39 +627,26 @@ def detect_slide_class(page: Page) -> tuple[str, int]:
             
             # Validate: phải có ít nhất 2 elements
             if count >= 2:
-                print(f"   ✅ Detected slide class: '.{best_class}' ({count} elements, score: {score})")
-                return f".{best_class}", count
+                logger.info(f"   ✅ Detected slide class: '.{best_class}' ({count} elements, score: {score})")
+                return f".{best_class}", count, counts
             else:
-                print(f"   ⚠️  Best class '.{best_class}' only has {count} element(s)")
+                logger.warning(f"   ⚠️  Best class '.{best_class}' only has {count} element(s)")
         
         # Fallback: thử các selector phổ biến
-        print("   💡 Trying alternative detection methods...")
-        alternative_selectors = [
-            '[class*="slide"]', 
-            '[class*="container"]',
-            '[class*="page"]',
-            'section',
-            '[class*="screen"]',
-            'body > div'
-        ]
-        
-        for selector in alternative_selectors:
-            try:
-                elements = page.locator(selector).all()
-                if len(elements) >= 2:
-                    print(f"   ✅ Found {len(elements)} elements with selector: {selector}")
-                    return selector, len(elements)
-            except:
-                continue
+        logger.info("   💡 Trying alternative detection methods...")
+        for selector in ALTERNATIVE_SELECTORS:
+            if counts.get(selector, 0) >= 2:
+                logger.info(f"   ✅ Found {counts[selector]} elements with selector: {selector}")
+                return selector, counts[selector], counts
         
-        return None, 0
+        return None, 0, counts
         
     except Exception as e:
-        print(f"   ❌ Error during detection: {str(e)}")
-        return None, 0
+        logger.error(f"   ❌ Error during detection: {str(e)}")
+        return None, 0, {}
 
 
-def get_slide_selector_with_fallback(page: Page, user_selector: str = None) -> tuple[str, int]:
+async def get_slide_selector_with_fallback(page: "Page", user_selector: str = None) -> tuple[str, int]:
     """
     Lấy slide selector với fallback strategies
     
@@ -346,55 +659,224 @@ def get_slide_selector_with_fallback(page: Page, user_selector: str = None) -> t
     """
     # Strategy 0: Nếu user đã chỉ định selector, ưu tiên dùng
     if user_selector:
-        print(f"\n🎯 Using user-specified selector: {user_selector}")
+        logger.info(f"\n🎯 Using user-specified selector: {user_selector}")
         try:
-            elements = page.locator(user_selector).all()
-            count = len(elements)
+            count = await page.locator(user_selector).count()
             if count > 0:
-                print(f"   ✅ Found {count} element(s) with selector: {user_selector}")
+                logger.info(f"   ✅ Found {count} element(s) with selector: {user_selector}")
                 return user_selector, count
             else:
-                print(f"   ⚠️  No elements found with selector: {user_selector}")
-                print("   💡 Falling back to auto-detection...")
+                logger.warning(f"   ⚠️  No elements found with selector: {user_selector}")
+                logger.info("   💡 Falling back to auto-detection...")
         except Exception as e:
-            print(f"   ❌ Error with selector '{user_selector}': {str(e)}")
-            print("   💡 Falling back to auto-detection...")
+            logger.error(f"   ❌ Error with selector '{user_selector}': {str(e)}")
+            logger.info("   💡 Falling back to auto-detection...")
     
     # Strategy 1: Auto-detect từ class name
-    selector, count = detect_slide_class(page)
+    selector, count, counts = await detect_slide_class(page)
     
     if selector and count > 0:
         return selector, count
     
-    # Strategy 2: Thử các common selectors
-    print("\n🔄 Trying common slide selectors...")
-    common_selectors = [
-        '.slide',
-        '.slides',
-        'section',
-        '.page',
-        '.screen',
-        '[class*="slide"]',
-        'body > div > div'
-    ]
-    
-    for selector in common_selectors:
+    # Strategy 2: Thử các common selectors (đã được đếm sẵn khi detect)
+    logger.info("\n🔄 Trying common slide selectors...")
+    if not counts:
         try:
-            elements = page.locator(selector).all()
-            if len(elements) > 0:
-                print(f"   ✅ Found {len(elements)} elements with: {selector}")
-                return selector, len(elements)
-        except:
-            continue
+            counts = await count_selectors(page, COMMON_SELECTORS)
+        except Exception as e:
+            logger.error(f"   ❌ Error while probing selectors: {str(e)}")
+    
+    for selector in COMMON_SELECTORS:
+        if counts.get(selector, 0) > 0:
+            logger.info(f"   ✅ Found {counts[selector]} elements with: {selector}")
+            return selector, counts[selector]
     
-    print("   ❌ No suitable selector found")
+    logger.error("   ❌ No suitable selector found")
     return None, 0
 
 
+# Ảnh loading="lazy" chỉ load khi gần viewport; chuyển sang eager và chờ (có giới hạn)
+# để slide nằm dưới màn hình đầu tiên cũng có ảnh khi capture
+LOAD_LAZY_IMAGES_JS = """
+(timeout) => {
+    const pending = Array.from(document.querySelectorAll('img[loading="lazy"]'), img => {
+        img.loading = 'eager';
+        if (img.complete) return null;
+        return new Promise(resolve => {
+            img.addEventListener('load', resolve, { once: true });
+            img.addEventListener('error', resolve, { once: true });
+        });
+    });
+    return Promise.race([
+        Promise.all(pending),
+        new Promise(resolve => setTimeout(resolve, timeout))
+    ]).then(() => pending.length);
+}
+"""
+
+# Cuộn slide vào viewport rồi chờ 2 frame để IntersectionObserver/hiệu ứng reveal kịp chạy
+SCROLL_TO_SLIDE_JS = """
+([x, y]) => {
+    window.scrollTo(x, y);
+    return new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+}
+"""
+
+
+async def get_slide_rects(page: "Page", selector: str) -> list[dict]:
+    """
+    Lấy vị trí tất cả slide trong một lần evaluate_all (toạ độ theo document),
+    không tạo ElementHandle nào cho từng slide
+
+    Args:
+        page: Playwright page instance
+        selector: Slide selector
+
+    Returns:
+        list: Clip rect {x, y, width, height} của từng slide đang hiển thị, theo thứ tự DOM
+    """
+    rects = await page.locator(selector).evaluate_all("""
+        (elements) => elements.map(el => {
+            const r = el.getBoundingClientRect();
+            return {
+                x: r.x + window.scrollX,
+                y: r.y + window.scrollY,
+                width: r.width,
+                height: r.height
+            };
+        })
+    """)
+
+    # Slide bị ẩn (display:none, ...) có kích thước 0: clip rỗng sẽ làm lỗi cả file
+    visible_rects = [rect for rect in rects if rect["width"] > 0 and rect["height"] > 0]
+    if len(visible_rects) < len(rects):
+        logger.info(f"   💡 Skipping {len(rects) - len(visible_rects)} hidden element(s) matching {selector}")
+
+    return visible_rects
+
+
+def count_distinct_rects(rects: list[dict]) -> int:
+    """Số vị trí slide khác nhau (các element chồng đúng lên nhau chỉ tính một)"""
+    return len({(rect["x"], rect["y"], rect["width"], rect["height"]) for rect in rects})
+
+
+def optimize_png(path: str):
+    """
+    Nén lại file PNG (lossless) bằng oxipng, bỏ qua nếu oxipng lỗi
+
+    Args:
+        path: Đường dẫn file PNG
+    """
+    subprocess.run(
+        ["oxipng", *OXIPNG_ARGS, path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=False,
+    )
+
+
+def write_base64_image(output_path: str, data: str):
+    """
+    Decode ảnh base64 (từ CDP) và ghi ra file
+
+    Args:
+        output_path: File output
+        data: Nội dung ảnh dạng base64
+    """
+    with open(output_path, "wb") as f:
+        f.write(base64.b64decode(data))
+
+
+def crop_slides(screenshot: bytes, rects: list[dict], output_paths: list[str],
+                image_format: str, quality: int):
+    """
+    Cắt từng slide từ một screenshot toàn trang và lưu ra file
+
+    Args:
+        screenshot: PNG toàn trang (ở DEVICE_SCALE_FACTOR)
+        rects: Clip rect của từng slide, toạ độ CSS theo document
+        output_paths: File output tương ứng với từng rect
+        image_format: 'jpeg', 'webp' hoặc 'png'
+        quality: Chất lượng nén jpeg/webp
+    """
+    with Image.open(io.BytesIO(screenshot)) as page_image:
+        page_image.load()
+        for rect, output_path in zip(rects, output_paths):
+            box = (
+                round(rect["x"] * DEVICE_SCALE_FACTOR),
+                round(rect["y"] * DEVICE_SCALE_FACTOR),
+                round((rect["x"] + rect["width"]) * DEVICE_SCALE_FACTOR),
+                round((rect["y"] + rect["height"]) * DEVICE_SCALE_FACTOR),
+            )
+            slide = page_image.crop(box)
+            if image_format == "jpeg":
+                slide.convert("RGB").save(output_path, "JPEG", quality=quality)
+            elif image_format == "webp":
+                slide.save(output_path, "WEBP", quality=quality)
+            else:
+                slide.save(output_path, "PNG")
+
+
+def file_digest(path: Path) -> str:
+    """
+    Hash toàn bộ nội dung file (đọc theo chunk)
+
+    Args:
+        path: Đường dẫn file
+
+    Returns:
+        str: Hex digest BLAKE2b của nội dung file
+    """
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def inspect_html(html_file: Path) -> tuple[str, Optional[tuple[str, str]]]:
+    """
+    Đọc phần đầu file HTML một lần để lấy fingerprint và nhận diện framework
+
+    Các deck sinh từ cùng template thường có phần <head>/<style> giống nhau,
+    nên có thể dùng lại slide selector đã detect cho cùng fingerprint.
+
+    Args:
+        html_file: Đường dẫn file HTML
+
+    Returns:
+        tuple: (hex digest của FINGERPRINT_BYTES byte đầu tiên,
+                (framework, selector) hoặc None nếu không nhận ra framework
+                trong FRAMEWORK_SCAN_BYTES byte đầu tiên)
+    """
+    with open(html_file, "rb") as f:
+        data = f.read(FRAMEWORK_SCAN_BYTES)
+    fingerprint = hashlib.blake2b(data[:FINGERPRINT_BYTES], digest_size=16).hexdigest()
+
+    text = data.decode("utf-8", errors="ignore")
+    for framework, pattern, selector in FRAMEWORK_SIGNATURES:
+        if pattern.search(text):
+            return fingerprint, (framework, selector)
+
+    return fingerprint, None
+
+
+async def _allow_local_files_only(route):
+    """Route handler: chỉ cho phép request tới file local, abort mọi request mạng"""
+    if route.request.url.startswith("file:"):
+        await route.continue_()
+    else:
+        await route.abort()
+
+
 class SlideCaptureBatchProcessor:
     """Handles batch processing of HTML slide files for screenshot capture"""
 
-    def __init__(self, source_dir: str = ".", output_base_dir: str = "output_images", slide_selector: str = None):
+    def __init__(self, source_dir: str = ".", output_base_dir: str = "output_images", slide_selector: str = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, image_format: str = DEFAULT_IMAGE_FORMAT,
+                 quality: int = DEFAULT_QUALITY, block_network: bool = False, optimize_png: bool = True,
+                 viewport: tuple[int, int] = DEFAULT_VIEWPORT, force: bool = False,
+                 full_page_crop: bool = False, browser_count: int = 1, dedupe: bool = False):
         """
         Initialize the batch processor
 
@@ -402,92 +884,546 @@ class SlideCaptureBatchProcessor:
             source_dir: Directory to scan for HTML files
             output_base_dir: Base directory for output images
             slide_selector: CSS selector for slides (None = auto-detect)
+            concurrency: Maximum number of HTML files rendered at the same time
+            image_format: Screenshot encoding ('jpeg', 'webp' or 'png')
+            quality: JPEG/WebP quality (ignored for PNG)
+            block_network: Abort every request that is not a local file:// URL
+            optimize_png: Losslessly recompress PNG output with oxipng when it is installed
+            viewport: (width, height) of every page, ideally the nominal slide size
+            force: Re-capture every file instead of reusing unchanged outputs
+            full_page_crop: Take one full-page screenshot per file and crop slides with Pillow
+            browser_count: Number of Chromium processes the workers are spread across
+            dedupe: Capture byte-identical HTML files once and copy the slides to the duplicates
         """
         self.source_dir = Path(source_dir).resolve()
+        # URI thư mục nguồn tính một lần (bỏ "/" cuối khi là thư mục gốc); URI từng file ghép chuỗi từ tên file
+        self._source_uri = self.source_dir.as_uri().removesuffix("/")
         self.output_base_dir = Path(output_base_dir).resolve()
         self.slide_selector = slide_selector
+        self.concurrency = max(1, concurrency)
+        if image_format not in IMAGE_EXTENSIONS:
+            raise ValueError(f"Định dạng ảnh không hỗ trợ: {image_format}")
+        self.image_format = image_format
+        self.image_ext = IMAGE_EXTENSIONS[image_format]
+        self.quality = quality
+        self.block_network = block_network
+        self.optimize_png = optimize_png
+        self.viewport = tuple(viewport)
+        self.force = force
+        self.full_page_crop = full_page_crop
+        self.browser_count = max(1, browser_count)
+        self.dedupe = dedupe
         self.html_files = []
         self.global_slide_counter = 0
+        self._io_pool = None
+        self._optimize_pool = None
+        self._out_prefix = None
+        self._context_locks: list[asyncio.Lock] = []
+        self._retired_contexts = []
+        self._selector_cache: dict[str, str] = {}
+        self._detected_selector = None
+        self._file_stats: dict[Path, os.stat_result] = {}
+        self._failed_files: set[Path] = set()
 
     def scan_html_files(self):
         """Scan source directory for all HTML files"""
-        print(f"\n{'='*60}")
-        print(f"SCANNING DIRECTORY: {self.source_dir}")
-        print(f"{'='*60}")
+        logger.info(f"\n{'='*60}")
+        logger.info(f"SCANNING DIRECTORY: {self.source_dir}")
+        logger.info(f"{'='*60}")
 
-        self.html_files = sorted(self.source_dir.glob("*.html"))
+        # Một lần scandir, lọc theo tên (không phân biệt hoa thường) trước khi gọi
+        # is_file(); bỏ qua file ẩn (vd: '._deck.html' do macOS tạo trên ổ ngoài)
+        with os.scandir(self.source_dir) as it:
+            entries = [
+                entry for entry in it
+                if entry.name.lower().endswith(".html") and not entry.name.startswith(".") and entry.is_file()
+            ]
+        entries.sort(key=lambda entry: entry.name)
+        self.html_files = [Path(entry.path) for entry in entries]
 
         if not self.html_files:
-            print("❌ Không tìm thấy file HTML nào trong thư mục.")
+            logger.error("❌ Không tìm thấy file HTML nào trong thư mục.")
             return False
 
-        print(f"\n✅ Tìm thấy {len(self.html_files)} file HTML:")
+        logger.info(f"\n✅ Tìm thấy {len(self.html_files)} file HTML:")
         for idx, file in enumerate(self.html_files, 1):
-            print(f"  [{idx}] {file.name}")
+            logger.info(f"  [{idx}] {file.name}")
 
         return True
 
-    def capture_slides_from_file(self, html_file: Path, browser) -> int:
+    async def capture_slides_from_file(self, html_file: Path, page: "Page", file_idx: int) -> list[str]:
         """
         Capture all slides from a single HTML file with auto-detection
-        
+
+        Slides are written to temporary per-file names so several files can be
+        captured concurrently; process_all renumbers them afterwards.
+
         Args:
             html_file: Path to the HTML file
-            browser: Playwright browser instance
-        
+            page: Worker page to load the file into (reused across files)
+            file_idx: 1-based position of the file in the batch
+
         Returns:
-            Number of slides captured from this file
+            Temporary paths of the slides captured from this file, in slide order
         """
-        print(f"\n{'─'*60}")
-        print(f"Processing: {html_file.name}")
-        print(f"{'─'*60}")
+        logger.info(f"\n{'─'*60}")
+        logger.info(f"[File {file_idx}/{len(self.html_files)}] Processing: {html_file.name}")
+        logger.info(f"{'─'*60}")
 
-        page = browser.new_page(device_scale_factor=2)
-        slides_captured = 0
+        cdp = None
+        captured = []
+        pending_writes = []
 
         try:
             # Load HTML file
-            file_url = html_file.as_uri()
-            print(f"Loading: {file_url}")
-            page.goto(file_url)
-            
-            print("Waiting for page to render (3 seconds)...")
-            page.wait_for_timeout(3000)
+            # fsencode: tên file không phải UTF-8 trên POSIX được quote theo byte gốc như as_uri()
+            file_url = self._source_uri + "/" + urllib.parse.quote(os.fsencode(html_file.name))
+            logger.info(f"Loading: {file_url}")
+            # File local nên 'load' về rất nhanh, không cần sleep cố định.
+            # Giữ goto(file://) thay vì set_content: page about:blank không được phép
+            # load ảnh/CSS tương đối từ file:// và không có localStorage cho script của deck
+            await page.goto(file_url, wait_until="load")
+            await page.evaluate("() => document.fonts && document.fonts.ready.then(() => true)")
 
-            # Get slide selector (user-specified or auto-detect)
-            selector, slide_count = get_slide_selector_with_fallback(page, self.slide_selector)
-            
-            if not selector or slide_count == 0:
-                print("❌ Cannot find slide elements in this file")
-                return 0
+            if self.slide_selector:
+                try:
+                    await page.wait_for_selector(self.slide_selector, state="attached", timeout=SELECTOR_WAIT_TIMEOUT)
+                except PlaywrightTimeoutError:
+                    logger.warning(f"   ⚠️  Selector {self.slide_selector} did not appear within {SELECTOR_WAIT_TIMEOUT} ms")
+                except PlaywrightError as e:
+                    # Selector không hợp lệ: get_slide_selector_with_fallback sẽ chuyển sang auto-detect
+                    logger.warning(f"   ⚠️  Cannot wait for selector {self.slide_selector}: {str(e)}")
+            else:
+                # Chưa biết selector: chờ các request do script render slide gửi đi xong
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=SELECTOR_WAIT_TIMEOUT)
+                except PlaywrightTimeoutError:
+                    logger.warning(f"   ⚠️  Network still busy after {SELECTOR_WAIT_TIMEOUT} ms, detecting anyway")
+
+            lazy_images = await page.evaluate(LOAD_LAZY_IMAGES_JS, SELECTOR_WAIT_TIMEOUT)
+            if lazy_images:
+                logger.debug("  Loaded %d lazy image(s) eagerly: %s", lazy_images, html_file.name)
+
+            # Auto-detect: thử các selector đã biết trước khi phân tích lại bằng JavaScript,
+            # rects cũng chính là số slide nên mỗi lần thử chỉ tốn một round-trip
+            fingerprint = None
+            candidates = []
+            if not self.slide_selector:
+                # Đọc file ở thread riêng để không chặn event loop của các page khác
+                fingerprint, framework = await asyncio.to_thread(inspect_html, html_file)
+                if fingerprint in self._selector_cache:
+                    # Deck cùng template -> dùng lại selector đã detect
+                    candidates.append((self._selector_cache[fingerprint], "♻️  Reusing detected selector", 1))
+                if framework:
+                    # Dấu hiệu framework chỉ là đoán từ source: cần >= 2 slide ở vị trí khác nhau
+                    candidates.append((framework[1], f"🧩 Detected {framework[0]} deck, selector", 2))
+                if self._detected_selector:
+                    # Template chưa gặp: thử class detect đầu tiên của batch, cần >= 2 slide như khi detect
+                    candidates.append((self._detected_selector, "♻️  Reusing first detected selector", 2))
+
+            selector = None
+            rects = []
+            for candidate, reason, min_rects in candidates:
+                rects = await get_slide_rects(page, candidate)
+                if rects and count_distinct_rects(rects) >= min_rects:
+                    selector = candidate
+                    logger.info(f"\n{reason}: {selector}")
+                    self._selector_cache[fingerprint] = selector
+                    break
+
+            if selector is None:
+                # Get slide selector (user-specified or auto-detect)
+                selector, slide_count = await get_slide_selector_with_fallback(page, self.slide_selector)
+                
+                if not selector or slide_count == 0:
+                    logger.error(f"❌ Cannot find slide elements in {html_file.name}")
+                    self._failed_files.add(html_file)
+                    return []
 
-            print(f"\n📸 Starting capture with selector: {selector}")
-            print(f"   Found {slide_count} slide(s)\n")
+                if fingerprint:
+                    self._selector_cache[fingerprint] = selector
+                    # Chỉ nhớ class detect đầu tiên, không ghi đè bằng các lần detect sau;
+                    # bỏ qua selector chung chung như 'section' vốn có thể khớp deck khác
+                    generic = selector in ALTERNATIVE_SELECTORS or selector in COMMON_SELECTORS
+                    if self._detected_selector is None and not generic:
+                        self._detected_selector = selector
+                rects = await get_slide_rects(page, selector)
 
-            # Capture slides
-            slides = page.locator(selector).all()
+            if not rects:
+                # Selector chỉ khớp element ẩn/kích thước 0: coi như không tìm thấy slide
+                logger.error(f"❌ Cannot find visible slide elements in {html_file.name}")
+                self._failed_files.add(html_file)
+                return []
+
+            slide_count = len(rects)
+            logger.info(f"\n📸 Starting capture with selector: {selector}")
+            logger.info(f"   Found {slide_count} slide(s)\n")
             
-            for idx, slide in enumerate(slides, 1):
-                self.global_slide_counter += 1
-                filename = f"{self.global_slide_counter:02d}.png"
-                output_path = self.output_base_dir / filename
+            use_full_page = self.full_page_crop
+            if use_full_page:
+                capture_height = max(rect["y"] + rect["height"] for rect in rects) * DEVICE_SCALE_FACTOR
+                if capture_height > MAX_FULL_PAGE_HEIGHT:
+                    logger.info(f"   💡 Page too tall for one screenshot ({capture_height:.0f}px), capturing per slide")
+                    use_full_page = False
+
+            if use_full_page:
+                # Một screenshot toàn trang, cắt từng slide bằng Pillow ở thread nền
+                screenshot = await page.screenshot(full_page=True, type="png")
+                output_paths = [self._temp_output_path(file_idx, idx) for idx in range(1, slide_count + 1)]
+                crop = asyncio.wrap_future(self._io_pool.submit(
+                    crop_slides, screenshot, rects, output_paths, self.image_format, self.quality
+                ))
+                pending_writes.extend((output_path, crop) for output_path in output_paths)
+            else:
+                # Một CDP session cho cả file, mỗi slide chỉ còn một lệnh Page.captureScreenshot
+                cdp = await page.context.new_cdp_session(page)
+                screenshot_params = {"format": self.image_format, "captureBeyondViewport": True}
+                if self.image_format != "png":
+                    screenshot_params["quality"] = self.quality
 
-                slide.screenshot(path=str(output_path))
-                print(f"  ✓ [{idx}/{slide_count}] Captured: {filename}")
-                slides_captured += 1
+                for idx, rect in enumerate(rects, 1):
+                    output_path = self._temp_output_path(file_idx, idx)
 
-            print(f"\n✅ Completed: {html_file.name}")
-            print(f"   Slides captured: {slide_count}")
+                    # Clip dùng toạ độ document nên không phụ thuộc vị trí cuộn, nhưng nội dung
+                    # chỉ render khi ở gần viewport thì cần cuộn tới slide trước khi chụp
+                    await page.evaluate(SCROLL_TO_SLIDE_JS, [rect["x"], rect["y"]])
+                    # scale=1: DEVICE_SCALE_FACTOR của context đã được áp dụng
+                    result = await cdp.send("Page.captureScreenshot", {**screenshot_params, "clip": {**rect, "scale": 1}})
+                    # Decode base64 + ghi file ở thread nền để slide tiếp theo được capture ngay
+                    write = asyncio.wrap_future(self._io_pool.submit(write_base64_image, output_path, result["data"]))
+                    pending_writes.append((output_path, write))
+                    logger.debug("  ✓ [%d/%d] Captured: %s", idx, slide_count, html_file.name)
+
+            logger.info(f"\n✅ Completed: {html_file.name}")
+            logger.info(f"   Slides captured: {len(pending_writes)}")
 
         except Exception as e:
-            print(f"❌ ERROR processing {html_file.name}: {str(e)}")
+            logger.error(f"❌ ERROR processing {html_file.name}: {str(e)}")
+            self._failed_files.add(html_file)
 
         finally:
-            page.close()
+            # Đợi các lệnh ghi còn chạy nền, chỉ giữ lại slide đã ghi thành công
+            results = await asyncio.gather(*(write for _, write in pending_writes), return_exceptions=True)
+            for (output_path, _), result in zip(pending_writes, results):
+                if isinstance(result, Exception):
+                    logger.error(f"❌ ERROR writing {os.path.basename(output_path)}: {str(result)}")
+                    self._failed_files.add(html_file)
+                else:
+                    captured.append(output_path)
+                    if self._optimize_pool:
+                        self._optimize_pool.submit(optimize_png, output_path)
+
+            if cdp:
+                try:
+                    await cdp.detach()
+                except Exception as e:
+                    # Page crash/đóng giữa chừng thì session đã tự detach
+                    logger.debug("CDP session detach failed for %s: %s", html_file.name, e)
+
+        return captured
+
+    def _temp_output_path(self, file_idx: int, slide_idx: int) -> str:
+        """Temporary (hidden) output path of a slide before global renumbering"""
+        return self._out_prefix + f".{file_idx:04d}_{slide_idx:03d}.{self.image_ext}"
+
+    def _final_output_path(self, slide_number: int) -> str:
+        """Final output path of a slide after global renumbering"""
+        return self._out_prefix + f"{slide_number:02d}.{self.image_ext}"
+
+    def _manifest_settings(self) -> dict:
+        """Settings that change the rendered output; a mismatch invalidates the manifest"""
+        return {
+            "slide_selector": self.slide_selector,
+            "image_format": self.image_format,
+            "quality": self.quality,
+            "viewport": list(self.viewport),
+            "block_network": self.block_network,
+            "full_page_crop": self.full_page_crop,
+        }
+
+    def _load_manifest(self) -> dict:
+        """
+        Load per-file entries of the previous run's manifest
+
+        Returns:
+            {html file name: {mtime_ns, size, start, count}}, empty if the
+            manifest is missing, unreadable or was written with other settings
+        """
+        try:
+            manifest = json.loads((self.output_base_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != self._manifest_settings():
+            return {}
+
+        return manifest.get("files", {})
+
+    def _find_unchanged_outputs(self, manifest_files: dict) -> dict[int, list[str]]:
+        """
+        Find HTML files whose outputs from the previous run can be reused
+
+        A file is unchanged when its mtime and size match the manifest and
+        all of its previous outputs still exist.
+
+        Args:
+            manifest_files: Entries returned by _load_manifest
+
+        Returns:
+            {file_idx: final slide paths of the previous run} for every unchanged file
+        """
+        unchanged = {}
+
+        for file_idx, html_file in enumerate(self.html_files, 1):
+            stat = self._file_stats[html_file]
+            entry = manifest_files.get(html_file.name)
+            if not entry or entry.get("mtime_ns") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+                continue
+
+            outputs = [self._final_output_path(entry["start"] + offset) for offset in range(entry["count"])]
+            if not all(os.path.exists(output) for output in outputs):
+                continue
+
+            unchanged[file_idx] = outputs
+            logger.info(f"⏭️  Unchanged, reusing {len(outputs)} slide(s): {html_file.name}")
 
-        return slides_captured
+        return unchanged
 
-    def process_all(self):
+    def _stage_unchanged_outputs(self, unchanged: dict[int, list[str]]) -> dict[int, list[str]]:
+        """
+        Move outputs of unchanged files to temporary names
+
+        Their slides then join the normal renumbering without being captured again.
+
+        Args:
+            unchanged: Mapping returned by _find_unchanged_outputs
+
+        Returns:
+            {file_idx: temporary slide paths} for every reused file
+        """
+        reused = {}
+        for file_idx, outputs in unchanged.items():
+            staged = []
+            for slide_idx, output in enumerate(outputs, 1):
+                temp_path = self._temp_output_path(file_idx, slide_idx)
+                os.replace(output, temp_path)
+                staged.append(temp_path)
+            reused[file_idx] = staged
+
+        return reused
+
+    def _restore_unchanged_outputs(self, unchanged: dict[int, list[str]]):
+        """
+        Undo _stage_unchanged_outputs when the batch stops before renumbering
+
+        Args:
+            unchanged: Mapping returned by _find_unchanged_outputs
+        """
+        for file_idx, outputs in unchanged.items():
+            for slide_idx, output in enumerate(outputs, 1):
+                temp_path = self._temp_output_path(file_idx, slide_idx)
+                if os.path.exists(temp_path):
+                    os.replace(temp_path, output)
+
+    def _save_manifest(self, results: list[list[str]]):
+        """
+        Record which output range every successfully captured file owns
+
+        Args:
+            results: Slide paths per file, in file order
+        """
+        files = {}
+        start = 1
+        for html_file, captured in zip(self.html_files, results):
+            if html_file not in self._failed_files:
+                stat = self._file_stats[html_file]
+                files[html_file.name] = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "start": start,
+                    "count": len(captured),
+                }
+            start += len(captured)
+
+        manifest = {"version": MANIFEST_VERSION, "settings": self._manifest_settings(), "files": files}
+        manifest_path = self.output_base_dir / MANIFEST_NAME
+        temp_path = manifest_path.with_name(MANIFEST_NAME + ".tmp")
+        temp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(temp_path, manifest_path)
+
+    def _find_duplicates(self, file_indexes: list[int]) -> dict[int, int]:
+        """
+        Group HTML files with identical content
+
+        Args:
+            file_indexes: 1-based indexes of the files to compare
+
+        Returns:
+            {duplicate file_idx: file_idx of the first file with the same content}
+        """
+        first_by_digest = {}
+        duplicates = {}
+
+        for file_idx in file_indexes:
+            html_file = self.html_files[file_idx - 1]
+            digest = file_digest(html_file)
+            if digest in first_by_digest:
+                duplicates[file_idx] = first_by_digest[digest]
+                logger.info(f"🔁 Duplicate of {self.html_files[first_by_digest[digest] - 1].name}: {html_file.name}")
+            else:
+                first_by_digest[digest] = file_idx
+
+        return duplicates
+
+    def _copy_duplicate_outputs(self, duplicates: dict[int, int], results_by_idx: dict[int, list[str]]):
+        """
+        Give every duplicate file its own temporary copies of the original's slides
+
+        Args:
+            duplicates: Mapping returned by _find_duplicates
+            results_by_idx: Captured slide paths by file_idx, updated in place
+        """
+        for duplicate_idx, original_idx in duplicates.items():
+            copies = []
+            for slide_idx, source_path in enumerate(results_by_idx.get(original_idx, []), 1):
+                temp_path = self._temp_output_path(duplicate_idx, slide_idx)
+                shutil.copyfile(source_path, temp_path)
+                copies.append(temp_path)
+            results_by_idx[duplicate_idx] = copies
+
+            if self.html_files[original_idx - 1] in self._failed_files:
+                self._failed_files.add(self.html_files[duplicate_idx - 1])
+
+    def _renumber_outputs(self, results: list[list[str]]) -> int:
+        """
+        Rename temporary per-file captures to the final global numbering
+
+        Each file owns the range [start, start + len(captured)) of output
+        numbers, assigned in file order once every capture has finished.
+
+        Args:
+            results: Temporary slide paths per file, in file order
+
+        Returns:
+            Total number of slides renamed
+        """
+        start = 1
+        for captured in results:
+            for offset, temp_path in enumerate(captured):
+                os.replace(temp_path, self._final_output_path(start + offset))
+            start += len(captured)
+
+        return start - 1
+
+    async def _new_context(self, browser):
+        """
+        Create the batch browser context on a pooled browser
+
+        Args:
+            browser: Playwright browser instance
+
+        Returns:
+            BrowserContext configured with the batch viewport and network policy
+        """
+        width, height = self.viewport
+        context = await browser.new_context(
+            viewport={"width": width, "height": height},
+            device_scale_factor=DEVICE_SCALE_FACTOR,
+            bypass_csp=True,
+        )
+        await context.add_init_script(DETECT_SLIDE_CLASS_JS)
+        if self.block_network:
+            await context.route("**/*", _allow_local_files_only)
+        return context
+
+    async def _open_worker_page(self, contexts: list, browser_idx: int):
+        """
+        Open a worker page on the given browser, relaunching it once if it is unusable
+
+        Args:
+            contexts: Batch context per browser index, updated in place on relaunch
+            browser_idx: Index of the pooled browser the worker belongs to
+
+        Returns:
+            Page, or None if the browser still cannot open pages after relaunching
+        """
+        context = contexts[browser_idx]
+        try:
+            return await context.new_page()
+        except Exception as e:
+            logger.warning(f"⚠️  Cannot open page on browser #{browser_idx + 1}: {str(e)}")
+
+        # Worker cùng browser chỉ relaunch một lần, các worker khác dùng luôn context mới
+        async with self._context_locks[browser_idx]:
+            if contexts[browser_idx] is context:
+                logger.info(f"🔄 Relaunching browser #{browser_idx + 1}...")
+                # Chưa đóng context cũ: page của worker khác trên đó có thể vẫn đang capture
+                self._retired_contexts.append(context)
+                try:
+                    contexts[browser_idx] = await self._new_context(await get_browser(browser_idx))
+                except Exception as e:
+                    logger.error(f"❌ ERROR relaunching browser #{browser_idx + 1}: {str(e)}")
+                    return None
+
+        try:
+            return await contexts[browser_idx].new_page()
+        except Exception as e:
+            logger.error(f"❌ Browser #{browser_idx + 1} is unusable, stopping its worker: {str(e)}")
+            return None
+
+    async def _capture_worker(self, contexts: list, browser_idx: int, jobs: deque, results: dict[int, list[str]]):
+        """
+        Capture files from the shared job queue with one long-lived page
+
+        The page is only replaced after a failed file, in case it crashed. If
+        the browser cannot open a page even after a relaunch, the worker stops
+        without taking a job, so the remaining files go to healthy browsers.
+
+        Args:
+            contexts: Batch context per browser index
+            browser_idx: Index of the pooled browser this worker uses
+            jobs: Queue of (file_idx, html_file) shared by all workers
+            results: Captured slide paths by file_idx, filled in place
+        """
+        page = None
+
+        try:
+            while jobs:
+                if page is None:
+                    page = await self._open_worker_page(contexts, browser_idx)
+                    if page is None:
+                        return
+                    # Trong lúc mở page, worker khác có thể đã lấy hết job
+                    continue
+
+                file_idx, html_file = jobs.popleft()
+                results[file_idx] = await self.capture_slides_from_file(html_file, page, file_idx)
+
+                if html_file in self._failed_files:
+                    await self._close_page(page)
+                    page = None
+
+        finally:
+            if page is not None:
+                await self._close_page(page)
+
+    @staticmethod
+    async def _close_page(page):
+        """Close a worker page, ignoring errors from a crashed page or disconnected browser"""
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug("Closing page failed: %s", e)
+
+    @staticmethod
+    async def _close_context(context):
+        """Close a batch context, ignoring errors from a disconnected browser"""
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug("Closing context failed: %s", e)
+
+    async def process_all(self):
         """Main processing method - batch process all HTML files"""
         start_time = time.time()
 
@@ -495,53 +1431,243 @@ class SlideCaptureBatchProcessor:
             return
 
         self.output_base_dir.mkdir(parents=True, exist_ok=True)
+        # Prefix thư mục output tính một lần, tên file từng slide chỉ cần ghép chuỗi
+        self._out_prefix = str(self.output_base_dir) + os.sep
         self.global_slide_counter = 0
+        self._failed_files = set()
+        # stat trước khi capture: file bị sửa trong lúc chạy sẽ được capture lại lần sau
+        self._file_stats = {html_file: html_file.stat() for html_file in self.html_files}
 
-        print(f"\n{'='*60}")
-        print(f"🚀 STARTING BATCH PROCESSING")
-        print(f"Output folder: {self.output_base_dir}")
+        logger.info(f"\n{'='*60}")
+        logger.info(f"🚀 STARTING BATCH PROCESSING")
+        logger.info(f"Output folder: {self.output_base_dir}")
         if self.slide_selector:
-            print(f"Slide selector: {self.slide_selector}")
+            logger.info(f"Slide selector: {self.slide_selector}")
         else:
-            print(f"Slide selector: Auto-detect")
-        print(f"{'='*60}")
+            logger.info(f"Slide selector: Auto-detect")
+        if self.block_network:
+            logger.info(f"Network: chỉ cho phép file://")
+        if self.full_page_crop and Image is None:
+            logger.warning("⚠️  Pillow is not installed, falling back to per-slide capture")
+            self.full_page_crop = False
+        logger.info(f"{'='*60}")
 
-        with sync_playwright() as p:
-            print("\n🌐 Launching Chromium browser (headless mode)...")
-            browser = p.chromium.launch(headless=True)
+        unchanged = {} if self.force else self._find_unchanged_outputs(self._load_manifest())
 
-            try:
-                for idx, html_file in enumerate(self.html_files, 1):
-                    print(f"\n[File {idx}/{len(self.html_files)}]")
-                    self.capture_slides_from_file(html_file, browser)
+        pending = [idx for idx in range(1, len(self.html_files) + 1) if idx not in unchanged]
+        duplicates = await asyncio.to_thread(self._find_duplicates, pending) if self.dedupe else {}
 
-            finally:
-                browser.close()
+        # Worker dùng chung một hàng đợi: file nào xong trước thì lấy file tiếp theo
+        job_list = [(idx, self.html_files[idx - 1]) for idx in pending if idx not in duplicates]
+        jobs = deque(job_list)
+
+        # Không mở nhiều page (và browser) hơn số file thật sự cần capture
+        concurrency = min(self.concurrency, len(job_list))
+        browser_count = min(self.browser_count, concurrency)
+        if job_list:
+            logger.info(f"Concurrent pages: {concurrency} (across {browser_count} browser(s))")
+
+        contexts = []
+        try:
+            if job_list:
+                # Mỗi browser một context dùng chung, mỗi worker giữ một page suốt batch
+                # Launch các browser song song rồi mới tạo context trên từng browser
+                browsers = await asyncio.gather(*(get_browser(idx) for idx in range(browser_count)))
+                for browser in browsers:
+                    contexts.append(await self._new_context(browser))
+                self._context_locks = [asyncio.Lock() for _ in contexts]
+                self._io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS)
+                if self.image_format == "png" and self.optimize_png:
+                    if shutil.which("oxipng"):
+                        # oxipng chạy ở process riêng, thread chỉ chờ nên không bị GIL chặn
+                        self._optimize_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+                    else:
+                        logger.info("💡 oxipng not found, PNG output will not be optimized")
+
+            # Chỉ đổi tên output cũ sang tên tạm khi browser đã sẵn sàng
+            results_by_idx = self._stage_unchanged_outputs(unchanged)
+
+            if job_list:
+                try:
+                    # Chia worker round-robin cho các browser; một worker lỗi không dừng các worker khác
+                    worker_results = await asyncio.gather(*[
+                        self._capture_worker(contexts, worker_idx % browser_count, jobs, results_by_idx)
+                        for worker_idx in range(concurrency)
+                    ], return_exceptions=True)
+                    for result in worker_results:
+                        if isinstance(result, Exception):
+                            logger.error(f"❌ ERROR in capture worker: {str(result)}")
+                    # File đang xử lý dở khi worker lỗi, hoặc còn trong hàng đợi khi mọi browser
+                    # đều hỏng, không có kết quả -> coi là lỗi, capture lại lần sau
+                    for idx, html_file in job_list:
+                        if idx not in results_by_idx:
+                            self._failed_files.add(html_file)
+
+                finally:
+                    # Chờ ghi file/oxipng ở thread riêng để không chặn các request khác của daemon
+                    await asyncio.to_thread(self._io_pool.shutdown, True)
+                    self._io_pool = None
+                    if self._optimize_pool:
+                        await asyncio.to_thread(self._optimize_pool.shutdown, True)
+                        self._optimize_pool = None
+
+            # Sau khi oxipng xong mới copy, để bản trùng cũng là ảnh đã tối ưu;
+            # copy ở thread riêng để không chặn các request khác của daemon
+            await asyncio.to_thread(self._copy_duplicate_outputs, duplicates, results_by_idx)
+
+        except BaseException:
+            # Batch dừng trước khi renumber (lỗi hoặc Ctrl+C): trả output cũ về tên gốc
+            self._restore_unchanged_outputs(unchanged)
+            raise
+
+        finally:
+            for context in contexts + self._retired_contexts:
+                await self._close_context(context)
+            self._retired_contexts = []
+
+        results = [results_by_idx.get(idx, []) for idx in range(1, len(self.html_files) + 1)]
+        self.global_slide_counter = self._renumber_outputs(results)
+        self._save_manifest(results)
 
         elapsed_time = time.time() - start_time
 
-        print(f"\n{'='*60}")
-        print(f"✅ BATCH PROCESSING COMPLETED")
-        print(f"{'='*60}")
-        print(f"📊 Total HTML files processed: {len(self.html_files)}")
-        print(f"📸 Total slides captured: {self.global_slide_counter}")
-        print(f"📁 Output directory: {self.output_base_dir}")
-        print(f"📄 Files: 01.png -> {self.global_slide_counter:02d}.png")
-        print(f"⏱️  Time elapsed: {elapsed_time:.2f} seconds")
-        print(f"{'='*60}\n")
+        logger.info(f"\n{'='*60}")
+        logger.info(f"✅ BATCH PROCESSING COMPLETED")
+        logger.info(f"{'='*60}")
+        logger.info(f"📊 Total HTML files processed: {len(self.html_files)}")
+        logger.info(f"📸 Total slides captured: {self.global_slide_counter}")
+        logger.info(f"📁 Output directory: {self.output_base_dir}")
+        logger.info(f"📄 Files: 01.{self.image_ext} -> {self.global_slide_counter:02d}.{self.image_ext}")
+        logger.info(f"⏱️  Time elapsed: {elapsed_time:.2f} seconds")
+        logger.info(f"{'='*60}\n")
+
+
+async def run_batch(processor: SlideCaptureBatchProcessor):
+    """
+    Chạy một batch trong process hiện tại rồi tắt browser
+
+    Args:
+        processor: Batch processor đã được cấu hình
+    """
+    try:
+        await processor.process_all()
+    finally:
+        await close_browser()
+
+
+async def serve_daemon(port: int = DEFAULT_DAEMON_PORT):
+    """
+    Chạy daemon: giữ Chromium warm và xử lý batch request gửi qua socket
+
+    Khi có kết nối, daemon gửi trước một dòng JSON {"protocol": DAEMON_PROTOCOL}.
+    Mỗi request là một dòng JSON chứa tham số của SlideCaptureBatchProcessor,
+    response là một dòng JSON với kết quả batch. Log của batch được in ở
+    output của daemon theo -q/-v lúc khởi động daemon.
+
+    Args:
+        port: Port lắng nghe trên localhost
+    """
+    async def handle_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write((json.dumps({"protocol": DAEMON_PROTOCOL}) + "\n").encode("utf-8"))
+        await writer.drain()
+
+        try:
+            request = json.loads(await reader.readline())
+            processor = SlideCaptureBatchProcessor(**request)
+            await processor.process_all()
+            response = {
+                "ok": True,
+                "files": len(processor.html_files),
+                "slides": processor.global_slide_counter,
+                "output_dir": str(processor.output_base_dir),
+            }
+        except Exception as e:
+            logger.error(f"❌ ERROR handling daemon request: {str(e)}")
+            response = {"ok": False, "error": str(e)}
+
+        writer.write((json.dumps(response) + "\n").encode("utf-8"))
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+    # Warm up browser ngay khi daemon khởi động
+    await get_browser()
+    server = await asyncio.start_server(handle_request, DAEMON_HOST, port)
+    logger.info(f"🛰️  Daemon listening on {DAEMON_HOST}:{port} (Ctrl+C để dừng)")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await close_browser()
+
+
+def submit_to_daemon(request: dict, port: int = DEFAULT_DAEMON_PORT) -> Optional[dict]:
+    """
+    Gửi batch request tới daemon đang chạy (nếu có)
+
+    Chỉ gửi request sau khi nhận đúng dòng chào DAEMON_PROTOCOL, nên service
+    khác đang chiếm port sẽ không làm tool treo.
+
+    Args:
+        request: Tham số của SlideCaptureBatchProcessor
+        port: Port của daemon
+
+    Returns:
+        dict or None: Response của daemon, hoặc None nếu không có daemon
+    """
+    try:
+        sock = socket.create_connection((DAEMON_HOST, port), timeout=1)
+    except OSError:
+        return None
+
+    with sock, sock.makefile("r", encoding="utf-8") as stream:
+        try:
+            sock.settimeout(DAEMON_HANDSHAKE_TIMEOUT)
+            hello = json.loads(stream.readline())
+        except (OSError, ValueError):
+            hello = None
+        if not isinstance(hello, dict) or hello.get("protocol") != DAEMON_PROTOCOL:
+            logger.warning(f"⚠️  Port {port} is not a capture daemon ({DAEMON_PROTOCOL})")
+            return None
+
+        # Batch có thể chạy lâu, bỏ timeout sau khi handshake xong
+        sock.settimeout(None)
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        line = stream.readline()
+
+    return json.loads(line) if line else {"ok": False, "error": "Daemon closed the connection"}
 
 
 def main():
     """Entry point of the script"""
-    print("""
+    args = parse_arguments()
+    if args.quiet:
+        log_level = logging.WARNING
+    elif args.verbose:
+        log_level = logging.DEBUG
+    else:
+        log_level = logging.INFO
+    # Root logger giữ mức WARNING để debug log của asyncio/thư viện khác không lẫn vào,
+    # chỉ logger của tool theo --quiet/--verbose
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    for name in (__name__, "browser_pool"):
+        logging.getLogger(name).setLevel(log_level)
+
+    logger.info("""
     ╔══════════════════════════════════════════════════════════╗
     ║   Batch HTML Slide Screenshot Capture Tool              ║
     ║   Powered by Playwright                                  ║
     ║   🇻🇳 Vietnamese Edition - Auto Class Detection          ║
     ╚══════════════════════════════════════════════════════════╝
     """)
-
-    args = parse_arguments()
+    
+    if args.daemon:
+        try:
+            asyncio.run(serve_daemon(args.port))
+        except KeyboardInterrupt:
+            logger.info("\n👋 Daemon stopped")
+        return
     
     # Xác định slide selector
     slide_selector = None
@@ -552,15 +1678,15 @@ def main():
         output_dir = args.output
         slide_selector = args.class_selector
         
-        print(f"📂 Using command line arguments:")
-        print(f"   Input:  {source_dir}")
-        print(f"   Output: {output_dir}")
-        print(f"   Selector: {slide_selector if slide_selector else 'Auto-detect'}")
+        logger.info(f"📂 Using command line arguments:")
+        logger.info(f"   Input:  {source_dir}")
+        logger.info(f"   Output: {output_dir}")
+        logger.info(f"   Selector: {slide_selector if slide_selector else 'Auto-detect'}")
         
         try:
             validate_directory(source_dir, "input")
         except ValueError as e:
-            print(f"\n❌ Error: {e}")
+            logger.error(f"\n❌ Error: {e}")
             return
             
     elif args.no_interactive:
@@ -569,23 +1695,47 @@ def main():
         output_dir = "output_images"
         slide_selector = args.class_selector
         
-        print(f"📂 Using default paths:")
-        print(f"   Input:  {source_dir}")
-        print(f"   Output: {output_dir}")
-        print(f"   Selector: {slide_selector if slide_selector else 'Auto-detect'}")
+        logger.info(f"📂 Using default paths:")
+        logger.info(f"   Input:  {source_dir}")
+        logger.info(f"   Output: {output_dir}")
+        logger.info(f"   Selector: {slide_selector if slide_selector else 'Auto-detect'}")
         
     else:
         # Interactive mode
         source_dir, output_dir = get_user_input_paths()
         slide_selector = get_user_input_class()
 
-    processor = SlideCaptureBatchProcessor(
-        source_dir=source_dir,
-        output_base_dir=output_dir,
-        slide_selector=slide_selector
-    )
+    # Daemon chạy ở thư mục khác nên luôn gửi đường dẫn tuyệt đối
+    request = {
+        "source_dir": str(Path(source_dir).resolve()),
+        "output_base_dir": str(Path(output_dir).resolve()),
+        "slide_selector": slide_selector,
+        "concurrency": args.concurrency,
+        "browser_count": args.browser_count,
+        "image_format": args.image_format,
+        "quality": args.quality,
+        "block_network": args.block_network,
+        "optimize_png": args.optimize_png,
+        "viewport": args.viewport,
+        "force": args.force,
+        "full_page_crop": args.full_page_crop,
+        "dedupe": args.dedupe,
+    }
+
+    response = submit_to_daemon(request, args.port) if args.use_daemon else None
+    if args.use_daemon and response is None:
+        logger.info(f"💡 No daemon on {DAEMON_HOST}:{args.port}, running locally")
+    if response is not None:
+        if response.get("ok"):
+            logger.info(f"\n✅ Daemon đã xử lý {response['files']} file HTML, {response['slides']} slide")
+            logger.info(f"📁 Output directory: {response['output_dir']}")
+        else:
+            logger.error(f"\n❌ Daemon error: {response.get('error')}")
+        return
+
+    processor = SlideCaptureBatchProcessor(**request)
 
-    processor.process_all()
+    asyncio.run(run_batch(processor))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+"""
+Browser Pool
+============
+Giữ các Chromium instance sống giữa các batch job để các lần chạy sau
+dùng lại CDP session đã warm thay vì khởi động browser lạnh mỗi lần.
+
+Usage:
+    browser = await get_browser()   # launch lần đầu, các lần sau dùng lại
+    second = await get_browser(1)   # browser process thứ hai để chia tải
+    ...
+    await close_browser()           # tắt hẳn tất cả khi process kết thúc
+"""
+
+import asyncio
+import logging
+from playwright.async_api import async_playwright, Browser, Playwright
+
+
+logger = logging.getLogger(__name__)
+
+# Flag tối giản cho batch screenshot các file HTML local (trusted).
+# Không dùng --single-process: Chromium không hỗ trợ ổn định khi mở
+# nhiều page/context song song như batch processor đang làm.
+CHROMIUM_ARGS = [
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-gpu-compositing",
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--mute-audio",
+    "--hide-scrollbars",
+    "--font-render-hinting=none",
+    "--disable-features=Translate,BackForwardCache",
+]
+
+
+_playwright: Playwright = None
+_browsers: dict[int, Browser] = {}
+_lock: asyncio.Lock = None
+# Mỗi index một lock riêng để nhiều browser có thể launch song song
+_index_locks: dict[int, asyncio.Lock] = {}
+
+
+async def _get_playwright() -> Playwright:
+    """Khởi động Playwright một lần cho cả process"""
+    global _playwright, _lock
+
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        if _playwright is None:
+            _playwright = await async_playwright().start()
+
+        return _playwright
+
+
+async def get_browser(index: int = 0) -> Browser:
+    """
+    Lấy browser dùng chung, launch nếu chưa có hoặc đã bị disconnect
+
+    Args:
+        index: Số thứ tự browser process trong pool (mỗi index là một Chromium riêng)
+
+    Returns:
+        Browser: Chromium instance dùng chung trong process
+    """
+    index_lock = _index_locks.setdefault(index, asyncio.Lock())
+
+    async with index_lock:
+        browser = _browsers.get(index)
+        if browser is None or not browser.is_connected():
+            playwright = await _get_playwright()
+
+            logger.info(f"\n🌐 Launching Chromium browser #{index + 1} (headless mode)...")
+            browser = await playwright.chromium.launch(
+                headless=True,
+                chromium_sandbox=False,
+                args=CHROMIUM_ARGS,
+            )
+            _browsers[index] = browser
+
+        return browser
+
+
+async def close_browser():
+    """Đóng tất cả browser và dừng Playwright nếu đang chạy"""
+    global _playwright, _lock
+
+    try:
+        # Đóng song song; một browser lỗi không làm các browser còn lại bị bỏ sót
+        results = await asyncio.gather(
+            *(browser.close() for browser in _browsers.values()), return_exceptions=True
+        )
+        for index, result in zip(list(_browsers), results):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️  Failed to close Chromium browser #{index + 1}: {str(result)}")
+    finally:
+        if _playwright is not None:
+            await _playwright.stop()
+        _playwright = None
+        _browsers.clear()
+        _index_locks.clear()
+        _lock = None